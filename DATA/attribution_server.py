@@ -0,0 +1,340 @@
+from mcp.server.fastmcp import FastMCP
+import httpx
+import asyncio
+import datetime
+
+from join_engine import Table, hash_join, group_by
+from records import decode_json
+from tokens import TokenError
+from server import API_BASE as LINKEDIN_API_BASE, HEADERS as LINKEDIN_HEADERS, tokens as linkedin_tokens
+from hubspot_server import API_BASE as HUBSPOT_API_BASE, HEADERS as HUBSPOT_HEADERS, tokens as hubspot_tokens
+from profiling import add_admin_tool, profiled
+
+# 1. Initialize
+mcp = FastMCP("Attribution")
+add_admin_tool(mcp)
+
+# HubSpot "Original Source" drill-downs. For paid social, drill-down 1 is the
+# network/utm_source and drill-down 2 is usually the utm_campaign.
+SOURCE_PROPERTIES = ["hs_analytics_source_data_1", "hs_analytics_source_data_2"]
+PAGE_LIMIT = 100
+# Max inputs per v4 batch associations request
+ASSOCIATION_BATCH = 1000
+
+
+class AttributionFetchError(Exception):
+    pass
+
+
+def normalize_key(value) -> str:
+    """Lowercases and strips a campaign name / UTM value so they can be matched."""
+    return str(value).strip().lower() if value not in (None, "") else ""
+
+
+def attribution_window(days_back: int) -> tuple:
+    """The reporting window shared by spend, contacts and deals."""
+    # Use 'Yesterday' to avoid Timezone errors
+    end_date = datetime.date.today() - datetime.timedelta(days=1)
+    start_date = end_date - datetime.timedelta(days=days_back)
+    return start_date, end_date
+
+
+def window_filter(property_name: str, start_date: datetime.date, end_date: datetime.date) -> dict:
+    """HubSpot search filter for a datetime property inside the window (whole UTC days)."""
+    start = datetime.datetime.combine(start_date, datetime.time.min, datetime.timezone.utc)
+    end = datetime.datetime.combine(end_date, datetime.time.max, datetime.timezone.utc)
+    return {
+        "propertyName": property_name,
+        "operator": "BETWEEN",
+        "value": str(int(start.timestamp() * 1000)),
+        "highValue": str(int(end.timestamp() * 1000)),
+    }
+
+
+def parse_hubspot_datetime(value):
+    """Parses HubSpot's ISO 8601 datetimes ("2025-06-01T12:00:00.000Z")."""
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+async def search_all(client: httpx.AsyncClient, url: str, payload: dict, max_records: int) -> tuple:
+    """Pages through a HubSpot search. Returns (results, truncated) where truncated means max_records cut it short."""
+    results = []
+    payload = {**payload, "limit": PAGE_LIMIT}
+    while True:
+        response = await client.post(url, headers=HUBSPOT_HEADERS, auth=hubspot_tokens, json=payload)
+        if response.status_code != 200:
+            raise AttributionFetchError(f"Error: {response.text}")
+        data = decode_json(response.content)
+        page = data.get("results", [])
+        after = data.get("paging", {}).get("next", {}).get("after")
+        if len(results) + len(page) > max_records or (after and len(results) + len(page) == max_records):
+            results.extend(page[:max_records - len(results)])
+            return results, True
+        results.extend(page)
+        if not after:
+            return results, False
+        payload["after"] = after
+
+
+async def fetch_campaign_spend(client: httpx.AsyncClient, account_id: str,
+                               start_date: datetime.date, end_date: datetime.date) -> Table:
+    """Loads campaigns plus their spend for the window into a Table."""
+    simple_id = account_id.split(":")[-1]
+    account_urn = f"urn:li:sponsoredAccount:{simple_id}"
+
+    response = await client.get(
+        f"{LINKEDIN_API_BASE}/adAccounts/{simple_id}/adCampaigns",
+        headers=LINKEDIN_HEADERS, auth=linkedin_tokens,
+        params={"q": "search"},
+    )
+    if response.status_code != 200:
+        raise AttributionFetchError(f"Error fetching campaigns: {response.text}")
+
+    campaigns = Table("campaigns")
+    for c in decode_json(response.content).get("elements", []):
+        campaigns.insert({
+            "campaign_id": str(c.get("id")),
+            "campaign": c.get("name") or "Unnamed",
+            "name_key": normalize_key(c.get("name")),
+            "spend": 0.0,
+            "impressions": 0,
+            "clicks": 0,
+        })
+    campaigns.create_index("campaign_id")
+
+    params = {
+        "q": "analytics",
+        "pivot": "CAMPAIGN",
+        "timeGranularity": "ALL",
+        "dateRange.start.day": start_date.day,
+        "dateRange.start.month": start_date.month,
+        "dateRange.start.year": start_date.year,
+        "dateRange.end.day": end_date.day,
+        "dateRange.end.month": end_date.month,
+        "dateRange.end.year": end_date.year,
+        "accounts": f"List({account_urn})",
+        "fields": "pivotValues,impressions,clicks,costInLocalCurrency",
+    }
+    response = await client.get(f"{LINKEDIN_API_BASE}/adAnalyticsV2", headers=LINKEDIN_HEADERS, auth=linkedin_tokens, params=params)
+
+    # LinkedIn returns 404 when there is no activity for the dates
+    if response.status_code == 404:
+        return campaigns
+    if response.status_code != 200:
+        raise AttributionFetchError(f"API Error ({response.status_code}): {response.text}")
+
+    for row in decode_json(response.content).get("elements", []):
+        for urn in row.get("pivotValues", []):
+            for campaign in campaigns.lookup("campaign_id", urn.split(":")[-1]):
+                campaign["spend"] += float(row.get("costInLocalCurrency") or 0)
+                campaign["impressions"] += int(row.get("impressions") or 0)
+                campaign["clicks"] += int(row.get("clicks") or 0)
+    return campaigns
+
+
+async def fetch_paid_social_contacts(client: httpx.AsyncClient, start_date: datetime.date,
+                                     end_date: datetime.date, max_records: int) -> tuple:
+    """Loads paid social contacts created in the window into a Table. Returns (table, truncated)."""
+    payload = {
+        "filterGroups": [{
+            "filters": [
+                {"propertyName": "hs_analytics_source", "operator": "EQ", "value": "PAID_SOCIAL"},
+                window_filter("createdate", start_date, end_date),
+            ]
+        }],
+        "sorts": [{"propertyName": "createdate", "direction": "DESCENDING"}],
+        "properties": ["email", "createdate", "hs_analytics_source"] + SOURCE_PROPERTIES,
+    }
+    results, truncated = await search_all(client, f"{HUBSPOT_API_BASE}/crm/v3/objects/contacts/search", payload, max_records)
+
+    contacts = Table("contacts")
+    for c in results:
+        props = c.get("properties", {})
+        row = {
+            "contact_id": str(c.get("id")),
+            "email": props.get("email"),
+            "createdate": parse_hubspot_datetime(props.get("createdate")),
+        }
+        for prop in SOURCE_PROPERTIES:
+            row[prop] = normalize_key(props.get(prop))
+        contacts.insert(row)
+    return contacts, truncated
+
+
+async def fetch_deal_contacts(client: httpx.AsyncClient, deal_ids: list) -> dict:
+    """Deal ID -> associated contact IDs, via the v4 batch associations API."""
+    url = f"{HUBSPOT_API_BASE}/crm/v4/associations/deals/contacts/batch/read"
+    associations = {}
+    for start in range(0, len(deal_ids), ASSOCIATION_BATCH):
+        inputs = [{"id": deal_id} for deal_id in deal_ids[start:start + ASSOCIATION_BATCH]]
+        response = await client.post(url, headers=HUBSPOT_HEADERS, auth=hubspot_tokens, json={"inputs": inputs})
+        # 207 = some deals have no associations
+        if response.status_code not in (200, 207):
+            raise AttributionFetchError(f"Error: {response.text}")
+        for result in decode_json(response.content).get("results", []):
+            deal_id = str(result.get("from", {}).get("id"))
+            associations[deal_id] = [str(to.get("toObjectId")) for to in result.get("to", [])]
+    return associations
+
+
+async def fetch_deals_with_contacts(client: httpx.AsyncClient, start_date: datetime.date,
+                                    end_date: datetime.date, max_records: int) -> tuple:
+    """
+    Loads deals created or closed in the window, one row per associated
+    contact, into a Table. Only deals won within the window count as won.
+    Returns (table, truncated).
+    """
+    payload = {
+        # Filter groups are ORed: created in the window, or closed in it
+        "filterGroups": [
+            {"filters": [window_filter("createdate", start_date, end_date)]},
+            {"filters": [window_filter("closedate", start_date, end_date)]},
+        ],
+        "sorts": [{"propertyName": "createdate", "direction": "DESCENDING"}],
+        "properties": ["dealname", "amount", "dealstage", "closedate", "hs_is_closed_won"],
+    }
+    results, truncated = await search_all(client, f"{HUBSPOT_API_BASE}/crm/v3/objects/deals/search", payload, max_records)
+    associations = await fetch_deal_contacts(client, [str(d.get("id")) for d in results])
+
+    window_start = datetime.datetime.combine(start_date, datetime.time.min, datetime.timezone.utc)
+    window_end = datetime.datetime.combine(end_date, datetime.time.max, datetime.timezone.utc)
+    deals = Table("deals")
+    for d in results:
+        deal_id = str(d.get("id"))
+        props = d.get("properties", {})
+        won = str(props.get("hs_is_closed_won", "")).lower() == "true" or props.get("dealstage") == "closedwon"
+        close_date = parse_hubspot_datetime(props.get("closedate"))
+        won = won and close_date is not None and window_start <= close_date <= window_end
+        for contact_id in associations.get(deal_id, []):
+            deals.insert({
+                "deal_id": deal_id,
+                "contact_id": contact_id,
+                "amount": props.get("amount") or 0,
+                "won": won,
+            })
+    return deals, truncated
+
+
+def match_contacts_to_campaigns(contacts: Table, campaigns: Table) -> Table:
+    """Tags each contact with the campaign whose name or ID matches its source drill-downs."""
+    campaigns.create_index("name_key")
+    matched = Table("matched_contacts")
+    for contact in contacts:
+        for prop in SOURCE_PROPERTIES:
+            value = contact.get(prop)
+            if not value:
+                continue
+            hits = campaigns.lookup("name_key", value) or campaigns.lookup("campaign_id", value)
+            if hits:
+                matched.insert({**contact, "campaign_id": hits[0]["campaign_id"]})
+                break
+    return matched
+
+
+def assign_deals_to_campaigns(contact_deals: Table) -> Table:
+    """
+    Reduces (matched contact x deal) rows to one row per deal, credited to the
+    campaign of its earliest-created matched contact (first touch). Each deal
+    then counts towards exactly one campaign, so totals add up.
+    """
+    first_touch = {}
+    for row in contact_deals:
+        # Contacts without a createdate sort last; contact ID breaks ties
+        rank = (row["createdate"] is None, row["createdate"] or datetime.datetime.min, row["contact_id"])
+        current = first_touch.get(row["deal_id"])
+        if current is None or rank < current[0]:
+            first_touch[row["deal_id"]] = (rank, row)
+
+    deals = Table("attributed_deals")
+    for _, row in first_touch.values():
+        deals.insert({
+            "deal_id": row["deal_id"],
+            "campaign_id": row["campaign_id"],
+            "won": 1 if row["won"] else 0,
+            "won_amount": row["amount"] if row["won"] else 0,
+        })
+    return deals
+
+
+@mcp.tool()
+@profiled
+async def get_campaign_attribution(account_id: str, days_back: int = 90, max_records: int = 5000) -> str:
+    """
+    Attributes HubSpot contacts and deals to LinkedIn campaigns in one call.
+    Spend, contacts (by createdate) and deals (created or closed, won only if
+    closed) all cover the same last `days_back` days. Contacts are matched to
+    campaigns on their Original Source drill-downs (hs_analytics_source_data_1/2
+    vs. campaign name or ID), then joined to deals through contact
+    associations. Each deal is credited to a single campaign: the one its
+    earliest-created matched contact came from (first touch), so deal counts
+    and revenue add up across campaigns. Returns spend, contacts, deals,
+    closed-won revenue and cost per won deal for each campaign. At most `max_records` contacts and deals
+    (newest first) are loaded; the output says when that cut the data short.
+    """
+    start_date, end_date = attribution_window(days_back)
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        try:
+            # A failed fetch cancels the other two before the client closes
+            async with asyncio.TaskGroup() as tg:
+                spend_task = tg.create_task(fetch_campaign_spend(client, account_id, start_date, end_date))
+                contacts_task = tg.create_task(fetch_paid_social_contacts(client, start_date, end_date, max_records))
+                deals_task = tg.create_task(fetch_deals_with_contacts(client, start_date, end_date, max_records))
+        except ExceptionGroup as group:
+            e = group.exceptions[0]
+            if isinstance(e, httpx.RequestError):
+                return f"Network Error: {str(e)}"
+            if isinstance(e, TokenError):
+                return f"Auth Error: {str(e)}"
+            if isinstance(e, AttributionFetchError):
+                return str(e)
+            raise
+    campaigns = spend_task.result()
+    contacts, contacts_truncated = contacts_task.result()
+    deals, deals_truncated = deals_task.result()
+
+    if not len(campaigns):
+        return "No campaigns found."
+
+    matched = match_contacts_to_campaigns(contacts, campaigns)
+    contact_stats = group_by(matched, "campaign_id", {"contacts": ("count_distinct", "contact_id")})
+    deal_stats = group_by(
+        assign_deals_to_campaigns(hash_join(matched, deals, "contact_id")),
+        "campaign_id",
+        {
+            "deals": ("count", "deal_id"),
+            "won_deals": ("sum", "won"),
+            "won_amount": ("sum", "won_amount"),
+        },
+    )
+
+    report = hash_join(hash_join(campaigns, contact_stats, "campaign_id", how="left"), deal_stats, "campaign_id", how="left")
+    rows = sorted(report, key=lambda r: (r.get("won_amount") or 0, r["spend"]), reverse=True)
+
+    lines = [
+        f"--- ATTRIBUTION ({start_date} to {end_date}, {len(matched)}/{len(contacts)} paid social contacts matched; "
+        f"deals credited to their first-touch campaign) ---"
+    ]
+    truncated = [name for name, cut in (("contacts", contacts_truncated), ("deals", deals_truncated)) if cut]
+    if truncated:
+        lines.append(
+            f"WARNING: only the newest {max_records} {' and '.join(truncated)} in the window were loaded "
+            f"(max_records); contact, deal and cost-per-deal figures are incomplete."
+        )
+    for r in rows:
+        won_deals = int(r.get("won_deals") or 0)
+        cost_per_deal = f"{r['spend'] / won_deals:.2f}" if won_deals else "N/A"
+        lines.append(
+            f"Campaign: {r['campaign']} (ID: {r['campaign_id']}) | Spend: {r['spend']:.2f} | "
+            f"Clicks: {r['clicks']} | Contacts: {r.get('contacts') or 0} | Deals: {r.get('deals') or 0} | "
+            f"Won: {won_deals} ({r.get('won_amount') or 0:.2f}) | Cost per Won Deal: {cost_per_deal}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    mcp.run()
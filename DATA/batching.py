@@ -0,0 +1,63 @@
+"""
+Micro-batching for concurrent lookups.
+
+Calls to `MicroBatcher.load(key)` that arrive within `window_seconds` of each
+other are collected and handed to one `fetch_many(keys)` call. The results are
+split back out to each waiting caller by key.
+"""
+import asyncio
+
+
+class MicroBatcher:
+    """
+    Collects keys for a short window and resolves them with one batch fetch.
+    `fetch_many(keys)` must return a dict of key -> result; a result that is an
+    Exception is raised to that key's callers only. Missing keys resolve to
+    `default`.
+    """
+
+    def __init__(self, fetch_many, window_seconds: float = 0.005, max_batch_size: int = 50, default=None):
+        self.fetch_many = fetch_many
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self.default = default
+        self._pending = {}  # key -> [futures]
+        self._flush_handle = None
+        self._tasks = set()  # keeps in-flight batches referenced until they finish
+
+    async def load(self, key):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(key, []).append(future)
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: dict):
+        try:
+            results = await self.fetch_many(list(batch))
+        except Exception as e:
+            results = {key: e for key in batch}
+
+        for key, futures in batch.items():
+            result = results.get(key, self.default)
+            for future in futures:
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
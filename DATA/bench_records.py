@@ -0,0 +1,133 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+# Compares peak memory of the old dict-tree handling against compact records
+# when list_deals pages through a large HubSpot deal list. Both modes page
+# through the same in-process stand-in for the API and keep the output lines
+# the tool returns; "records" runs the server's own fetch_records.
+# Usage: python bench_records.py [deals]   (default 50000)
+
+PAGE_SIZE = 100
+URL = "https://api.hubapi.com/crm/v3/objects/deals"
+
+def make_pages(total):
+    """Synthetic HubSpot list pages, encoded like response.content."""
+    pages = []
+    for start in range(0, total, PAGE_SIZE):
+        results = []
+        for i in range(start, min(start + PAGE_SIZE, total)):
+            results.append({
+                "id": str(1000000 + i),
+                "properties": {
+                    "dealname": f"Deal {i}",
+                    "amount": str(1000 + i % 9000),
+                    "dealstage": "qualifiedtobuy",
+                    "closedate": "2025-07-01T12:00:00.000Z",
+                    "pipeline": "default",
+                    "createdate": "2025-06-01T12:00:00.000Z",
+                    "hs_lastmodifieddate": "2025-06-02T12:00:00.000Z",
+                    "hs_object_id": str(1000000 + i),
+                },
+                "createdAt": "2025-06-01T12:00:00.000Z",
+                "updatedAt": "2025-06-02T12:00:00.000Z",
+                "archived": False,
+            })
+        data = {"results": results}
+        if start + PAGE_SIZE < total:
+            data["paging"] = {"next": {"after": str(len(pages) + 1)}}
+        pages.append(json.dumps(data).encode("utf-8"))
+    return pages
+
+def use_pages(pages):
+    """Points every httpx.AsyncClient at the synthetic pages."""
+    def handler(request):
+        return httpx.Response(200, content=pages[int(request.url.params.get("after", "0"))])
+
+    class StandInClient(httpx.AsyncClient):
+        def __init__(self, **kwargs):
+            super().__init__(transport=httpx.MockTransport(handler), **kwargs)
+
+    httpx.AsyncClient = StandInClient
+
+async def run_dicts(total):
+    # Old behaviour: keep every response.json() tree, then build strings from it
+    trees = []
+    params = {"limit": PAGE_SIZE}
+    async with httpx.AsyncClient() as client:
+        while True:
+            data = (await client.get(URL, params=params)).json()
+            trees.append(data)
+            after = data.get("paging", {}).get("next", {}).get("after")
+            if not after:
+                break
+            params["after"] = after
+    lines = []
+    for data in trees:
+        for d in data.get("results", []):
+            props = d.get("properties", {})
+            name = props.get("dealname", "Unnamed Deal")
+            amount = props.get("amount", "0")
+            stage = props.get("dealstage", "Unknown Stage")
+            close_date = props.get("closedate", "No Date")
+            lines.append(f"Deal: {name} | Amount: {amount} | Stage: {stage} | Close Date: {close_date}")
+    return len(lines), "\n".join(lines)
+
+async def run_records(total):
+    # What list_deals does now
+    from hubspot_server import fetch_records, finish_records
+    from records import Deal
+    records = await fetch_records(URL, {"properties": ",".join(Deal.PROPERTIES)}, Deal, total)
+    lines = []
+    for d in records:
+        name = d.dealname or "Unnamed Deal"
+        amount = d.amount or "0"
+        stage = d.dealstage or "Unknown Stage"
+        close_date = d.closedate or "No Date"
+        lines.append(f"Deal: {name} | Amount: {amount} | Stage: {stage} | Close Date: {close_date}")
+    return len(lines), "\n".join(lines) + finish_records(records)
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def child(mode, total):
+    pages = make_pages(total)
+    use_pages(pages)
+    if mode == "records":
+        # Imported up front so its cost is not part of the run; the stand-in API ignores the token
+        os.environ.setdefault("HUBSPOT_ACCESS_TOKEN", "bench")
+        import hubspot_server  # noqa: F401
+    baseline = peak_rss_kb()
+    start = time.perf_counter()
+    count, output = asyncio.run(run_dicts(total) if mode == "dicts" else run_records(total))
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_kb()
+    growth = f"{(peak - baseline) / 1024:.1f} MB" if peak is not None else "n/a"
+    print(json.dumps({"mode": mode, "rows": count, "seconds": round(elapsed, 3), "peak_rss_growth": growth}))
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    print(f"📊 MEMORY BENCHMARK: list_deals over {total} deals in pages of {PAGE_SIZE}\n")
+    # Each mode runs in its own process so peak RSS is not shared
+    for mode in ("dicts", "records"):
+        out = subprocess.run([sys.executable, __file__, "--child", mode, str(total)], capture_output=True, text=True)
+        if out.returncode != 0:
+            print(f"   ❌ {mode} failed: {out.stderr}")
+            continue
+        result = json.loads(out.stdout)
+        print(f"   {result['mode']:8} | {result['rows']} rows | {result['seconds']}s | peak RSS growth: {result['peak_rss_growth']}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
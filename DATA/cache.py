@@ -0,0 +1,254 @@
+"""
+Caches for upstream API results.
+
+TTLCache lives in the process. SQLiteCache persists to a WAL-mode SQLite file
+so every stdio-spawned server process (one per MCP client) shares warm entries.
+Both carry tags (e.g. "deal" or "deal:123") so that webhook events can
+invalidate only the entries that actually contain a changed object.
+
+Use get_cache(): it returns a SQLiteCache when MCP_CACHE_DIR is set.
+"""
+import contextlib
+import os
+import pickle
+import sqlite3
+import time
+from collections import OrderedDict, defaultdict
+
+
+class TTLCache:
+    """LRU cache with per-entry TTLs and tag-based invalidation."""
+
+    def __init__(self, ttl_seconds: float = 300.0, max_entries: int = 512):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = defaultdict(set)  # tag -> keys
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self.invalidate(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float = None, tags=()):
+        """Stores `value` for `ttl` seconds (default ttl_seconds); a TTL of 0 stores nothing."""
+        self.invalidate(key)
+        ttl = self.ttl_seconds if ttl is None else ttl
+        if ttl <= 0:
+            return
+        expires_at = time.monotonic() + ttl
+        tags = frozenset(tags)
+        self._entries[key] = (expires_at, value, tags)
+        for tag in tags:
+            self._tags[tag].add(key)
+        while len(self._entries) > self.max_entries:
+            self.invalidate(next(iter(self._entries)))
+
+    def update(self, key, value) -> bool:
+        """Replaces the value of a live entry, keeping its expiry and tags."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        self._entries[key] = (entry[0], value, entry[2])
+        return True
+
+    def modify(self, key, fn) -> bool:
+        """Replaces the value of a live entry with fn(value), keeping its expiry and tags."""
+        value = self.get(key)
+        if value is None:
+            return False
+        return self.update(key, fn(value))
+
+    def invalidate(self, key) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return True
+
+    def keys_for_tag(self, tag) -> list:
+        return list(self._tags.get(tag, ()))
+
+    def invalidate_tag(self, tag) -> int:
+        """Drops every entry carrying `tag`. Returns how many were removed."""
+        return sum(self.invalidate(key) for key in self.keys_for_tag(tag))
+
+    def clear(self):
+        self._entries.clear()
+        self._tags.clear()
+
+
+class SQLiteCache:
+    """
+    Persistent cache shared between processes.
+    WAL mode lets readers run alongside a writer; SQLite's file locking keeps
+    concurrent writers safe. Entries have per-key TTLs, and the least recently
+    used ones are evicted once the file holds more than `max_bytes` of values
+    (recency is tracked to within `touch_interval` seconds, so reads only
+    write when an entry's last touch is older than that).
+    Values are pickled, so only point this at a directory you trust.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 300.0, max_bytes: int = 64 * 1024 * 1024,
+                 touch_interval: float = 60.0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self._db = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+            CREATE TABLE IF NOT EXISTS tags (
+                tag TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (tag, key)
+            );
+            CREATE INDEX IF NOT EXISTS tags_key ON tags (key);
+        """)
+
+    def get(self, key):
+        now = time.time()
+        row = self._db.execute("SELECT value, expires_at, accessed_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            self.invalidate(key)
+            return None
+        if now - row[2] >= self.touch_interval:
+            # Writing takes the database lock; WAL readers never do
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl: float = None, tags=()):
+        """Stores `value` for `ttl` seconds (default ttl_seconds); a TTL of 0 stores nothing."""
+        ttl = self.ttl_seconds if ttl is None else ttl
+        if ttl <= 0:
+            self.invalidate(key)
+            return
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        expires_at = now + ttl
+        with self._transaction():
+            self._db.execute("DELETE FROM tags WHERE key = ?", (key,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), expires_at, now)
+            )
+            self._db.executemany("INSERT OR IGNORE INTO tags (tag, key) VALUES (?, ?)", [(tag, key) for tag in set(tags)])
+            self._evict(now)
+
+    def update(self, key, value) -> bool:
+        """Replaces the value of a live entry, keeping its expiry and tags."""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        cursor = self._db.execute(
+            "UPDATE entries SET value = ?, size = ? WHERE key = ? AND expires_at >= ?",
+            (blob, len(blob), key, time.time())
+        )
+        return cursor.rowcount > 0
+
+    def modify(self, key, fn) -> bool:
+        """
+        Replaces the value of a live entry with fn(value), keeping its expiry
+        and tags. Read and write happen in one transaction, so another
+        process's set() can't land in between and be overwritten.
+        """
+        with self._transaction():
+            row = self._db.execute(
+                "SELECT value FROM entries WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+            if row is None:
+                return False
+            blob = pickle.dumps(fn(pickle.loads(row[0])), protocol=pickle.HIGHEST_PROTOCOL)
+            self._db.execute("UPDATE entries SET value = ?, size = ? WHERE key = ?", (blob, len(blob), key))
+        return True
+
+    def invalidate(self, key) -> bool:
+        with self._transaction():
+            self._db.execute("DELETE FROM tags WHERE key = ?", (key,))
+            return self._db.execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount > 0
+
+    def keys_for_tag(self, tag) -> list:
+        return [row[0] for row in self._db.execute("SELECT key FROM tags WHERE tag = ?", (tag,))]
+
+    def invalidate_tag(self, tag) -> int:
+        """Drops every entry carrying `tag`. Returns how many were removed."""
+        with self._transaction():
+            removed = self._db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM tags WHERE tag = ?)", (tag,)
+            ).rowcount
+            self._db.execute("DELETE FROM tags WHERE key NOT IN (SELECT key FROM entries)")
+        return removed
+
+    def clear(self):
+        with self._transaction():
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM tags")
+
+    def close(self):
+        self._db.close()
+
+    def _evict(self, now: float):
+        """Drops expired entries, then least recently used ones until under max_bytes."""
+        self._db.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total > self.max_bytes:
+            # Walk entries oldest-first and drop them until enough bytes are freed
+            self._db.execute("""
+                DELETE FROM entries WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, size, SUM(size) OVER (ORDER BY accessed_at, key) AS freed
+                        FROM entries
+                    ) WHERE freed - size < ?
+                )
+            """, (total - self.max_bytes,))
+        self._db.execute("DELETE FROM tags WHERE key NOT IN (SELECT key FROM entries)")
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT, so writers from other processes queue on the lock."""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+
+def get_cache(namespace: str, ttl_seconds: float = 300.0):
+    """
+    Returns the cache for a server. With MCP_CACHE_DIR set, this is a
+    SQLiteCache at <dir>/<namespace>.sqlite3 (bounded by MCP_CACHE_MAX_MB),
+    shared by every process using the same directory.
+    """
+    cache_dir = os.environ.get("MCP_CACHE_DIR")
+    if not cache_dir:
+        return TTLCache(ttl_seconds=ttl_seconds)
+    os.makedirs(cache_dir, exist_ok=True)
+    max_mb = float(os.environ.get("MCP_CACHE_MAX_MB", "64"))
+    return SQLiteCache(
+        os.path.join(cache_dir, f"{namespace}.sqlite3"),
+        ttl_seconds=ttl_seconds,
+        max_bytes=int(max_mb * 1024 * 1024)
+    )
@@ -1,9 +1,11 @@
 import httpx
 import asyncio
 
+from tokens import load_access_token
+
 # --- CONFIGURATION ---
-# I have pasted your token directly here to avoid the "No Token Found" error
-ACCESS_TOKEN = "AQWkKXim-oqXnFtJfr46yhTzjqGOpjUC4nDMIwE2udJaKxzwMD0ZVrQoEeYWAh_Sjuj4eVJoueJae2ktgtp1mADMfLu-5xoMOm8P1WbAd34QzIgu-xoNGahFylCpR2vIu3xLDz9jN6EUEH-N3YEjdRk7tbBeTp_Cw1BTVTfv98-97LlqF2Q_FaYnSnpUiQkIJa97QYt0NkG4QTalJociKJ7Vq2L8ZG7yuN3jlUqWqe0wxJf_zKmC1bte6tG4yOpLhRT0A2MjACrOyRTAZOyOvHWLmFa4_y1WW2O17nJ81b2506Xyz_IpSGthyfh2iDkst_wsLO017cnMOomldMfidhlenPspow"
+# Token comes from LINKEDIN_ACCESS_TOKEN (or LINKEDIN_TOKEN_FILE)
+ACCESS_TOKEN = load_access_token("LINKEDIN")
 
 API_BASE = "https://api.linkedin.com/rest"
 
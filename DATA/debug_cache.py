@@ -0,0 +1,84 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from cache import SQLiteCache
+
+# Several server processes hammering one MCP_CACHE_DIR at once
+WRITERS = 8
+OPS_PER_WRITER = 400
+MAX_BYTES = 256 * 1024  # small, so eviction runs under contention
+VALUE = "x" * 2048
+
+
+def writer(path: str, n: int, errors):
+    cache = SQLiteCache(path, ttl_seconds=60, max_bytes=MAX_BYTES)
+    try:
+        for i in range(OPS_PER_WRITER):
+            cache.set(f"w{n}:{i}", {"writer": n, "i": i, "data": VALUE}, tags=[f"writer:{n}", "shared"])
+            cache.get(f"w{(n + 1) % WRITERS}:{i}")
+            if i % 50 == 49:
+                cache.invalidate_tag(f"writer:{(n + 2) % WRITERS}")
+            if i % 97 == 96:
+                cache.update(f"w{n}:{i}", {"writer": n, "i": i, "data": "updated"})
+            if i % 13 == 12:
+                # another writer's entry, read-modify-write like a webhook patch
+                cache.modify(f"w{(n + 1) % WRITERS}:{i - 1}", lambda value: {**value, "data": "patched"})
+    except Exception as e:
+        errors.put(f"writer {n}: {type(e).__name__}: {e}")
+    finally:
+        cache.close()
+
+
+def write_one(path: str, key: str, value):
+    cache = SQLiteCache(path, ttl_seconds=60, max_bytes=MAX_BYTES)
+    cache.set(key, value)
+    cache.close()
+
+
+def main():
+    print("🔎 SHARED CACHE TEST...\n")
+    path = os.path.join(tempfile.mkdtemp(), "linkedin.sqlite3")
+    SQLiteCache(path).close()  # create the schema before the writers race for it
+
+    print(f"1. {WRITERS} processes x {OPS_PER_WRITER} writes (with reads, updates, patches, tag invalidations)...")
+    errors = multiprocessing.Queue()
+    start = time.perf_counter()
+    processes = [multiprocessing.Process(target=writer, args=(path, n, errors)) for n in range(WRITERS)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    print(f"   Done in {time.perf_counter() - start:.2f}s | Exit codes: {sorted({p.exitcode for p in processes})} (expected [0])")
+
+    failures = []
+    while not errors.empty():
+        failures.append(errors.get())
+    print(f"   Errors: {len(failures)} (expected 0)")
+    for failure in failures[:5]:
+        print(f"   ❌ {failure}")
+
+    print("\n2. Checking the file...")
+    db = sqlite3.connect(path)
+    print(f"   Integrity: {db.execute('PRAGMA integrity_check').fetchone()[0]} (expected ok)")
+    total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    print(f"   Stored: {total} bytes (limit {MAX_BYTES})")
+    orphans = db.execute("SELECT COUNT(*) FROM tags WHERE key NOT IN (SELECT key FROM entries)").fetchone()[0]
+    print(f"   Orphaned tags: {orphans} (expected 0)")
+    db.close()
+
+    print("\n3. Cross-process visibility...")
+    cache = SQLiteCache(path, ttl_seconds=60, max_bytes=MAX_BYTES)
+    p = multiprocessing.Process(target=write_one, args=(path, "from-child", "hello"))
+    p.start()
+    p.join()
+    print(f"   Value written by another process: {cache.get('from-child')!r} (expected 'hello')")
+    cache.close()
+
+    print("\n✅ TEST COMPLETE.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import httpx
+import asyncio
+import os
+import tempfile
+import time
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from tokens import TokenManager
+
+# Local stand-in OAuth endpoint that issues short-lived tokens
+HOST = "127.0.0.1"
+PORT = 8766
+TOKEN_URL = f"http://{HOST}:{PORT}/oauth/token"
+EXPIRES_IN = 8  # seconds
+
+issued = []
+
+async def token_endpoint(request: Request):
+    form = await request.form()
+    if form.get("grant_type") != "refresh_token" or form.get("refresh_token") != f"refresh-{len(issued)}":
+        return JSONResponse({"error": "invalid_grant"}, status_code=400)
+    await asyncio.sleep(0.2)  # slow endpoint, so concurrent callers would pile up
+    issued.append(time.time())
+    n = len(issued)
+    return JSONResponse({"access_token": f"access-{n}", "refresh_token": f"refresh-{n}", "expires_in": EXPIRES_IN})
+
+async def api_endpoint(request: Request):
+    # Only the newest token is accepted, like a provider that revoked the old one early
+    if request.headers.get("Authorization") != f"Bearer access-{len(issued)}":
+        return JSONResponse({"message": "Unauthorized"}, status_code=401)
+    return JSONResponse({"ok": True})
+
+async def main():
+    import uvicorn
+
+    print("🔎 TOKEN MANAGER TEST...\n")
+    app = Starlette(routes=[Route("/oauth/token", token_endpoint, methods=["POST"]), Route("/api", api_endpoint)])
+    server = uvicorn.Server(uvicorn.Config(app, host=HOST, port=PORT, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    await asyncio.sleep(0.5)
+
+    token_file = os.path.join(tempfile.mkdtemp(), "token.json")
+    manager = TokenManager(
+        access_token="access-0",
+        refresh_token="refresh-0",
+        expires_at=time.time() + 1,  # already inside the refresh margin
+        token_url=TOKEN_URL,
+        token_file=token_file,
+        refresh_margin=5,
+        name="STANDIN"
+    )
+
+    try:
+        print("1. 50 concurrent calls with a token about to expire...")
+        tokens = await asyncio.gather(*(manager.get_token() for _ in range(50)))
+        print(f"   Tokens handed out: {sorted(set(tokens))}")
+        print(f"   Refresh requests: {len(issued)} (expected 1)")
+
+        print("\n2. Calls while the token is fresh...")
+        await asyncio.gather(*(manager.get_token() for _ in range(50)))
+        print(f"   Refresh requests: {len(issued)} (expected 1)")
+
+        print("\n3. Second process picks up the refreshed token from the file...")
+        other = TokenManager(access_token="access-0", refresh_token="refresh-0", expires_at=time.time(),
+                             token_url=TOKEN_URL, token_file=token_file, refresh_margin=5)
+        print(f"   Token: {await other.get_token()} | Refresh requests: {len(issued)} (expected 1)")
+
+        print(f"\n4. Waiting {EXPIRES_IN - 5}s until the refresh margin is reached...")
+        await asyncio.sleep(EXPIRES_IN - 5 + 0.5)
+        print(f"   Token: {await manager.get_token()} | Refresh requests: {len(issued)} (expected 2)")
+
+        print(f"\n5. Token file permissions: {oct(os.stat(token_file).st_mode & 0o777)} (expected 0o600 on POSIX)")
+
+        print("\n6. Unknown expiry, token rejected with 401 by 20 concurrent requests...")
+        unknown = TokenManager(access_token="revoked", refresh_token=f"refresh-{len(issued)}",
+                               token_url=TOKEN_URL, name="STANDIN")
+        async with httpx.AsyncClient(auth=unknown) as client:
+            responses = await asyncio.gather(*(client.get(f"http://{HOST}:{PORT}/api") for _ in range(20)))
+        print(f"   Statuses: {sorted({r.status_code for r in responses})} (expected [200])")
+        print(f"   Refresh requests: {len(issued)} (expected 3)")
+
+        print("\n7. 401 with nothing to refresh with...")
+        static = TokenManager(access_token="revoked", name="STANDIN")
+        async with httpx.AsyncClient(auth=static) as client:
+            response = await client.get(f"http://{HOST}:{PORT}/api")
+        print(f"   Status: {response.status_code} (expected 401) | Refresh requests: {len(issued)} (expected 3)")
+    except httpx.RequestError as e:
+        print(f"❌ Could not reach stand-in endpoint: {e}")
+    finally:
+        server.should_exit = True
+        await task
+
+    print("\n✅ TEST COMPLETE.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+import httpx
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+
+from cache import TTLCache
+from records import Contact, Deal
+from webhooks import record_tags, bind_socket, create_server, serve
+
+# Local stand-in for HubSpot: starts the receiver and posts event batches to it
+HOST = "127.0.0.1"
+PORT = 8765
+URL = f"http://{HOST}:{PORT}/webhooks/hubspot"
+# HubSpot signs the public URL (tunnel/proxy); set HUBSPOT_WEBHOOK_URL to simulate one
+SIGNED_URL = os.environ.get("HUBSPOT_WEBHOOK_URL", URL)
+# Unsigned events may only invalidate, so sign with a stand-in secret by default
+CLIENT_SECRET = os.environ.setdefault("HUBSPOT_CLIENT_SECRET", "debug-secret")
+
+def event(subscription, object_id, **extra):
+    return {
+        "eventId": int(time.time() * 1000000) % 10**9,
+        "subscriptionId": 1,
+        "portalId": 1,
+        "appId": 1,
+        "occurredAt": int(time.time() * 1000),
+        "subscriptionType": subscription,
+        "attemptNumber": 0,
+        "objectId": object_id,
+        "changeSource": "CRM",
+        **extra
+    }
+
+def signed_headers(body):
+    headers = {"Content-Type": "application/json"}
+    if CLIENT_SECRET:
+        timestamp = str(int(time.time() * 1000))
+        source = f"POST{SIGNED_URL}{body}{timestamp}".encode("utf-8")
+        digest = hmac.new(CLIENT_SECRET.encode("utf-8"), source, hashlib.sha256).digest()
+        headers["X-HubSpot-Signature-v3"] = base64.b64encode(digest).decode()
+        headers["X-HubSpot-Request-Timestamp"] = timestamp
+    return headers
+
+async def main():
+    print("🔎 WEBHOOK RECEIVER TEST...\n")
+
+    # Seed the cache the way hubspot_server.py does
+    cache = TTLCache()
+    deals = [
+        Deal("101", dealname="Acme", dealstage="appointmentscheduled"),
+        Deal("102", dealname="Globex", dealstage="qualifiedtobuy"),
+    ]
+    contacts = [Contact("201", email="jane@acme.com")]
+    cache.set("deal:list:10", deals, tags=record_tags("deal", deals))
+    cache.set("contact:search:", contacts, tags=record_tags("contact", contacts, search=True))
+    cache.set("contact:search:jane", contacts, tags=record_tags("contact", contacts, search=True))
+    # A search the contact will start matching once its email changes
+    cache.set("contact:search:globex", [], tags=record_tags("contact", [], search=True))
+    cache.set("company:list:10", [], tags=record_tags("company", []))
+
+    server = create_server(cache, HOST, PORT)
+    task = asyncio.create_task(serve(server, bind_socket(HOST, PORT)))
+    await asyncio.sleep(0.5)
+
+    batches = [
+        ("1. Deal stage change (patched in place)", [event("deal.propertyChange", 101, propertyName="dealstage", propertyValue="closedwon")]),
+        ("2. Contact email change (searches dropped)", [event("contact.propertyChange", 201, propertyName="email", propertyValue="jane@globex.com")]),
+        ("3. Deal deletion (only lists holding it dropped)", [event("deal.deletion", 102)]),
+        ("4. Company creation (company lists dropped)", [event("company.creation", 301)]),
+    ]
+
+    async with httpx.AsyncClient() as client:
+        for title, batch in batches:
+            print(title)
+            body = json.dumps(batch)
+            try:
+                response = await client.post(URL, content=body, headers=signed_headers(body))
+            except httpx.RequestError as e:
+                print(f"   ❌ Could not reach receiver: {e}")
+                break
+            print(f"   Status: {response.status_code} | {response.text}")
+            print(f"   deal:list:10       -> {cache.get('deal:list:10')}")
+            print(f"   contact:search:    -> {cache.get('contact:search:')}")
+            print(f"   contact:search:globex -> {cache.get('contact:search:globex')}")
+            print(f"   company:list:10    -> {cache.get('company:list:10')}\n")
+
+    server.should_exit = True
+    await task
+    print("✅ TEST COMPLETE.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,25 +1,141 @@
 from mcp.server.fastmcp import FastMCP
+from contextlib import asynccontextmanager
+import asyncio
 import httpx
 import os
+import sys
+import errno
 import json
 
-# Initialize Server
-mcp = FastMCP("HubSpot CRM")
+from cache import get_cache
+from records import Contact, Company, Deal, RecordSink, decode_json
+from tokens import TokenManager, TokenError
+from webhooks import record_tags, bind_socket, create_server, serve
+from profiling import add_admin_tool, profiled
 
 # Constants
 API_BASE = "https://api.hubapi.com"
-ACCESS_TOKEN = os.environ.get("HUBSPOT_ACCESS_TOKEN")
+# HUBSPOT_ACCESS_TOKEN / HUBSPOT_REFRESH_TOKEN / HUBSPOT_TOKEN_FILE, refreshed before expiry or on a 401
+tokens = TokenManager.from_env("HUBSPOT")
 
-if not ACCESS_TOKEN:
-    raise ValueError("HUBSPOT_ACCESS_TOKEN environment variable is not set")
+# bind() errors meaning another process owns the port
+ADDRESS_IN_USE = (errno.EADDRINUSE, getattr(errno, "WSAEADDRINUSE", None))
 
-def get_headers():
-    return {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
+# HubSpot caps list pages at 100 objects
+PAGE_LIMIT = 100
+
+# Result records, kept fresh by HubSpot webhooks (see webhooks.py).
+# Shared across server processes when MCP_CACHE_DIR is set. Caching is only
+# switched on (for HUBSPOT_CACHE_TTL seconds) while a receiver pushes
+# invalidations: the one in this process, or, with a shared cache, the one
+# in the process that owns HUBSPOT_WEBHOOK_PORT. Otherwise every call goes
+# to the API, as nothing would ever tell the cache its data changed.
+CACHE_TTL = float(os.environ.get("HUBSPOT_CACHE_TTL", "300"))
+cache = get_cache("hubspot", ttl_seconds=0)
+WEBHOOK_PORT = os.environ.get("HUBSPOT_WEBHOOK_PORT")
+
+async def run_receiver(webhook_server, sock):
+    cache.ttl_seconds = CACHE_TTL
+    try:
+        await serve(webhook_server, sock)
+    finally:
+        # Nothing keeps cached records fresh any more
+        cache.ttl_seconds = 0
+        cache.clear()
+
+@asynccontextmanager
+async def lifespan(server):
+    """Runs the webhook receiver next to the MCP server when HUBSPOT_WEBHOOK_PORT is set."""
+    if not WEBHOOK_PORT:
+        yield
+        return
+    host = os.environ.get("HUBSPOT_WEBHOOK_HOST", "127.0.0.1")
+    try:
+        webhook_server = create_server(cache, host, int(WEBHOOK_PORT))
+    except ValueError as e:
+        print(f"HubSpot webhook receiver disabled: {e}", file=sys.stderr)
+        yield
+        return
+    try:
+        sock = bind_socket(host, int(WEBHOOK_PORT))
+    except OSError as e:
+        # Usually another client's HubSpot server already owns the port;
+        # keep serving tools without a receiver (stdout belongs to MCP)
+        print(f"HubSpot webhook receiver disabled: cannot bind {host}:{WEBHOOK_PORT}: {e}", file=sys.stderr)
+        if e.errno in ADDRESS_IN_USE and os.environ.get("MCP_CACHE_DIR"):
+            # That process's receiver keeps the shared cache fresh
+            cache.ttl_seconds = CACHE_TTL
+        yield
+        return
+    task = asyncio.create_task(run_receiver(webhook_server, sock))
+    try:
+        yield
+    finally:
+        webhook_server.should_exit = True
+        await task
+
+# Initialize Server
+mcp = FastMCP("HubSpot CRM", lifespan=lifespan)
+add_admin_tool(mcp)
+
+# Authorization is added per request by the token manager (AsyncClient(auth=tokens))
+HEADERS = {
+    "Content-Type": "application/json"
+}
+
+class HubSpotAPIError(Exception):
+    pass
+
+async def fetch_records(url: str, params: dict, record_type, limit: int) -> RecordSink:
+    """
+    Pages through a CRM list endpoint, decoding each page straight into
+    compact records. The per-call memory budget (MCP_MEMORY_BUDGET_MB)
+    truncates or spills large result sets.
+    """
+    sink = RecordSink.from_env(record_type)
+    params = {**params, "limit": min(limit, PAGE_LIMIT)}
+
+    async with httpx.AsyncClient(auth=tokens) as client:
+        while len(sink) < limit:
+            try:
+                response = await client.get(url, headers=HEADERS, params=params)
+            except TokenError:
+                sink.close()
+                raise
+            if response.status_code != 200:
+                sink.close()
+                raise HubSpotAPIError(response.text)
+
+            data = decode_json(response.content)
+            for result in data.get("results", [])[:limit - len(sink)]:
+                if not sink.add(record_type.from_result(result)):
+                    return sink
+
+            after = data.get("paging", {}).get("next", {}).get("after")
+            if not after:
+                break
+            params["after"] = after
+    return sink
+
+def cache_sink(cache_key: str, object_type: str, sink: RecordSink):
+    """Caches the records unless they overflowed the memory budget (then the sink itself is returned)."""
+    if sink.spilled or sink.truncated:
+        return sink
+    records = sink.records
+    cache.set(cache_key, records, tags=record_tags(object_type, records))
+    return records
+
+def finish_records(records) -> str:
+    """Releases any spill file and returns a note if the result was truncated."""
+    if not isinstance(records, RecordSink):
+        return ""
+    records.close()
+    if records.truncated:
+        return f"\n(Truncated at {len(records)} records: MCP_MEMORY_BUDGET_MB reached)"
+    return ""
 
 @mcp.tool()
+@profiled
 async def search_contacts(query: str = None) -> str:
     """
     Search for contacts by name, email, or company. 
@@ -31,7 +147,7 @@ async def search_contacts(query: str = None) -> str:
     payload = {
         "filterGroups": [],
         "sorts": ["-createdAt"],
-        "properties": ["firstname", "lastname", "email", "company", "jobtitle", "phone"],
+        "properties": list(Contact.PROPERTIES),
         "limit": 10
     }
     
@@ -61,81 +177,93 @@ async def search_contacts(query: str = None) -> str:
             }
         ]
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=get_headers(), json=payload)
-        
-    if response.status_code != 200:
-        return f"Error: {response.text}"
-        
-    data = response.json()
+    cache_key = f"contact:search:{query or ''}"
+    records = cache.get(cache_key)
+    if records is None:
+        async with httpx.AsyncClient(auth=tokens) as client:
+            try:
+                response = await client.post(url, headers=HEADERS, json=payload)
+            except TokenError as e:
+                return f"Auth Error: {str(e)}"
+
+        if response.status_code != 200:
+            return f"Error: {response.text}"
+
+        records = [Contact.from_result(r) for r in decode_json(response.content).get("results", [])]
+        cache.set(cache_key, records, tags=record_tags("contact", records, search=True))
+
     results = []
-    for c in data.get("results", []):
-        props = c.get("properties", {})
-        first = props.get('firstname', '') or ""
-        last = props.get('lastname', '') or ""
+    for c in records:
+        first = c.firstname or ""
+        last = c.lastname or ""
         name = f"{first} {last}".strip() or "Unnamed"
-        email = props.get("email", "No Email")
-        phone = props.get("phone", "No Phone")
-        results.append(f"Name: {name} | Email: {email} | Phone: {phone} | ID: {c.get('id')}")
+        email = c.email or "No Email"
+        phone = c.phone or "No Phone"
+        results.append(f"Name: {name} | Email: {email} | Phone: {phone} | ID: {c.id}")
         
     return "\n".join(results) if results else "No contacts found."
 
 @mcp.tool()
+@profiled
 async def list_companies(limit: int = 10) -> str:
     """Lists recent companies added to the CRM."""
     url = f"{API_BASE}/crm/v3/objects/companies"
     params = {
-        "limit": limit,
-        "properties": "name,domain,city,industry,phone",
+        "properties": ",".join(Company.PROPERTIES),
         "sort": "-createdAt"
     }
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=get_headers(), params=params)
 
-    if response.status_code != 200:
-        return f"Error: {response.text}"
-        
-    data = response.json()
+    cache_key = f"company:list:{limit}"
+    records = cache.get(cache_key)
+    if records is None:
+        try:
+            records = cache_sink(cache_key, "company", await fetch_records(url, params, Company, limit))
+        except HubSpotAPIError as e:
+            return f"Error: {e}"
+        except TokenError as e:
+            return f"Auth Error: {str(e)}"
+
     results = []
-    for c in data.get("results", []):
-        props = c.get("properties", {})
-        name = props.get('name', 'Unknown')
-        domain = props.get('domain', 'N/A')
-        city = props.get('city', 'N/A')
-        results.append(f"Company: {name} | Domain: {domain} | City: {city} | ID: {c.get('id')}")
-        
-    return "\n".join(results)
+    for c in records:
+        name = c.name or "Unknown"
+        domain = c.domain or "N/A"
+        city = c.city or "N/A"
+        results.append(f"Company: {name} | Domain: {domain} | City: {city} | ID: {c.id}")
+
+    return "\n".join(results) + finish_records(records)
 
 @mcp.tool()
+@profiled
 async def list_deals(limit: int = 10) -> str:
     """Lists recent deals/opportunities."""
     url = f"{API_BASE}/crm/v3/objects/deals"
     params = {
-        "limit": limit,
-        "properties": "dealname,amount,dealstage,closedate,pipeline",
+        "properties": ",".join(Deal.PROPERTIES),
         "sort": "-createdAt"
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=get_headers(), params=params)
-
-    if response.status_code != 200:
-        return f"Error: {response.text}"
+    cache_key = f"deal:list:{limit}"
+    records = cache.get(cache_key)
+    if records is None:
+        try:
+            records = cache_sink(cache_key, "deal", await fetch_records(url, params, Deal, limit))
+        except HubSpotAPIError as e:
+            return f"Error: {e}"
+        except TokenError as e:
+            return f"Auth Error: {str(e)}"
 
-    data = response.json()
     results = []
-    for d in data.get("results", []):
-        props = d.get("properties", {})
-        name = props.get("dealname", "Unnamed Deal")
-        amount = props.get("amount", "0")
-        stage = props.get("dealstage", "Unknown Stage")
-        close_date = props.get("closedate", "No Date")
+    for d in records:
+        name = d.dealname or "Unnamed Deal"
+        amount = d.amount or "0"
+        stage = d.dealstage or "Unknown Stage"
+        close_date = d.closedate or "No Date"
         results.append(f"Deal: {name} | Amount: {amount} | Stage: {stage} | Close Date: {close_date}")
 
-    return "\n".join(results) if results else "No deals found."
+    return "\n".join(results) + finish_records(records) if results else "No deals found."
 
 @mcp.tool()
+@profiled
 async def get_conversations() -> str:
     """
     Reads recent threads from the HubSpot Inbox (Conversations).
@@ -151,8 +279,11 @@ async def get_conversations() -> str:
         "limit": 5
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=get_headers(), params=params)
+    async with httpx.AsyncClient(auth=tokens) as client:
+        try:
+            response = await client.get(url, headers=HEADERS, params=params)
+        except TokenError as e:
+            return f"Auth Error: {str(e)}"
 
     if response.status_code != 200:
         return f"HubSpot API Error ({response.status_code}): {response.text} - Check if 'conversations.read' scope is enabled."
@@ -0,0 +1,121 @@
+"""
+Tiny in-memory table engine used to stitch LinkedIn and HubSpot data together.
+
+Rows are plain dicts. Tables keep optional hash indexes on columns so joins
+and lookups stay O(n + m) instead of nested loops over every API result.
+"""
+from collections import defaultdict
+
+
+class Table:
+    """A list of dict rows with optional hash indexes on columns."""
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = []
+        self.indexes = {}
+        for row in rows or []:
+            self.insert(row)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def insert(self, row):
+        self.rows.append(row)
+        for column, index in self.indexes.items():
+            key = row.get(column)
+            if key is not None:
+                index[key].append(row)
+
+    def create_index(self, column):
+        """Builds (or rebuilds) a hash index on `column`. Returns the table."""
+        index = defaultdict(list)
+        for row in self.rows:
+            key = row.get(column)
+            if key is not None:
+                index[key].append(row)
+        self.indexes[column] = index
+        return self
+
+    def lookup(self, column, value):
+        """Returns all rows where `column == value`, using the index if there is one."""
+        if column not in self.indexes:
+            self.create_index(column)
+        return self.indexes[column].get(value, [])
+
+
+def hash_join(left, right, left_on, right_on=None, how="inner"):
+    """
+    Joins two tables on `left_on == right_on`.
+    The right table is probed through its hash index (built on demand).
+    `how` is "inner" or "left". Right-hand columns that collide with
+    left-hand ones are prefixed with the right table's name.
+    """
+    right_on = right_on or left_on
+    if how not in ("inner", "left"):
+        raise ValueError(f"Unsupported join type: {how}")
+
+    joined = Table(f"{left.name}_{right.name}")
+    for row in left:
+        key = row.get(left_on)
+        matches = right.lookup(right_on, key) if key is not None else []
+        if not matches:
+            if how == "left":
+                joined.insert(dict(row))
+            continue
+        for match in matches:
+            merged = dict(row)
+            for column, value in match.items():
+                if column in merged and column != right_on:
+                    column = f"{right.name}.{column}"
+                merged[column] = value
+            joined.insert(merged)
+    return joined
+
+
+def group_by(table, key, aggregations):
+    """
+    Groups rows by `key` and applies aggregations.
+    `aggregations` maps output column -> (function, source column), where the
+    function is one of "sum", "count", "count_distinct", "min", "max" or a
+    callable that receives the list of values.
+    """
+    groups = defaultdict(list)
+    for row in table:
+        groups[row.get(key)].append(row)
+
+    result = Table(f"{table.name}_by_{key}")
+    for group_key, rows in groups.items():
+        out = {key: group_key}
+        for column, (func, source) in aggregations.items():
+            values = [r.get(source) for r in rows if r.get(source) is not None]
+            out[column] = _aggregate(func, values)
+        result.insert(out)
+    return result
+
+
+def _aggregate(func, values):
+    if callable(func):
+        return func(values)
+    if func == "sum":
+        return sum(_to_number(v) for v in values)
+    if func == "count":
+        return len(values)
+    if func == "count_distinct":
+        return len(set(values))
+    if func == "min":
+        return min(values) if values else None
+    if func == "max":
+        return max(values) if values else None
+    raise ValueError(f"Unknown aggregation: {func}")
+
+
+def _to_number(value):
+    # HubSpot and LinkedIn both return numbers as strings ("1234.50")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
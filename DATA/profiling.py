@@ -0,0 +1,305 @@
+"""
+On-demand profiling for MCP tool calls.
+
+Decorate a tool with @profiled (below @mcp.tool()). While profiling is off the
+wrapper costs one attribute check. When it is on, chosen tool calls are sampled
+(every Nth call, optionally keeping only calls slower than a threshold) and
+written to MCP_PROFILE_DIR:
+
+- cprofile mode: <name>.prof   (pstats; open with snakeviz, tuna or flameprof)
+- stack mode:    <name>.folded (collapsed stacks from a sampler thread; open
+                 with flamegraph.pl or speedscope). Samples in the event loop's
+                 select() are time spent waiting on upstream APIs; anything
+                 else is CPU work blocking the loop.
+- both:          <name>.json   (wall vs CPU time, so wait = wall - cpu, the
+                 number of asyncio tasks alive, and how long each task or
+                 callback held the event loop while the call ran)
+
+Only the newest MCP_PROFILE_KEEP samples are kept.
+
+Environment:
+    MCP_PROFILE_TOOLS        comma-separated tool names, or "*" (unset = off)
+    MCP_PROFILE_EVERY        sample every Nth call of a chosen tool (default 1)
+    MCP_PROFILE_SLOW_MS      only keep samples slower than this (default 0)
+    MCP_PROFILE_MODE         "cprofile" (default) or "stack"
+    MCP_PROFILE_INTERVAL_MS  stack sampling interval (default 5)
+    MCP_PROFILE_DIR          output directory (default <tmp>/mcp-profiles)
+    MCP_PROFILE_KEEP         samples to keep (default 50)
+"""
+from collections import Counter
+import asyncio
+import cProfile
+import functools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+MODES = ("cprofile", "stack")
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="mcp-stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+            self.counts[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class LoopMonitor:
+    """
+    Times every event loop callback while active, grouped by the task it steps
+    (or the callback itself when it belongs to no task). This is the per-task
+    side of the picture: which tasks held the loop during a sample, and for
+    how long. Works by wrapping asyncio's (private) Handle._run, so it only
+    covers the default asyncio event loop.
+    """
+
+    def __init__(self):
+        self.stats = {}  # (kind, name, coroutine) -> [busy seconds, steps, longest step]
+        self._original = None
+
+    def start(self):
+        original = self._original = asyncio.events.Handle._run
+        stats = self.stats
+
+        def _run(handle):
+            start = time.perf_counter()
+            try:
+                original(handle)
+            finally:
+                elapsed = time.perf_counter() - start
+                key = self.describe(handle._callback)
+                entry = stats.setdefault(key, [0.0, 0, 0.0])
+                entry[0] += elapsed
+                entry[1] += 1
+                entry[2] = max(entry[2], elapsed)
+
+        asyncio.events.Handle._run = _run
+
+    def stop(self):
+        if self._original is not None:
+            asyncio.events.Handle._run = self._original
+            self._original = None
+
+    @staticmethod
+    def describe_task(task: asyncio.Task) -> tuple:
+        coro = task.get_coro()
+        return ("task", task.get_name(), getattr(coro, "__qualname__", type(coro).__name__))
+
+    @classmethod
+    def describe(cls, callback) -> tuple:
+        # Task steps and wakeups are bound to their task
+        task = getattr(callback, "__self__", None)
+        if isinstance(task, asyncio.Task):
+            return cls.describe_task(task)
+        return ("callback", getattr(callback, "__qualname__", type(callback).__name__), None)
+
+    def timings(self, sampled_task: asyncio.Task = None, top: int = 20) -> list:
+        """The `top` tasks/callbacks by time spent holding the loop; `sampled_task` is marked as the tool call."""
+        sampled = self.describe_task(sampled_task) if sampled_task is not None else None
+        busiest = sorted(self.stats.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        timings = []
+        for key, (busy, steps, longest) in busiest:
+            kind, name, coroutine = key
+            entry = {kind: name}
+            if coroutine:
+                entry["coroutine"] = coroutine
+            if key == sampled:
+                entry["tool_call"] = True
+            entry.update(busy_ms=round(busy * 1000, 3), steps=steps, longest_step_ms=round(longest * 1000, 3))
+            timings.append(entry)
+        return timings
+
+
+class Profiler:
+    def __init__(self):
+        self.configure()
+        self._calls = Counter()
+        self._active = False
+        self._writes = set()  # keeps in-flight sample writes referenced until they finish
+
+    def configure(self, tools: str = None, every_n: int = None, slow_ms: float = None, mode: str = None,
+                  interval_ms: float = None, output_dir: str = None, keep: int = None):
+        """Applies settings; anything left as None comes from the environment."""
+        env = os.environ
+        tools = env.get("MCP_PROFILE_TOOLS", "") if tools is None else tools
+        mode = env.get("MCP_PROFILE_MODE", "cprofile") if mode is None else mode
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode} (use one of {', '.join(MODES)})")
+
+        self.tools = {t.strip() for t in tools.split(",") if t.strip()}
+        self.every_n = max(1, int(env.get("MCP_PROFILE_EVERY", "1") if every_n is None else every_n))
+        self.slow_ms = float(env.get("MCP_PROFILE_SLOW_MS", "0") if slow_ms is None else slow_ms)
+        self.mode = mode
+        self.interval = float(env.get("MCP_PROFILE_INTERVAL_MS", "5") if interval_ms is None else interval_ms) / 1000
+        self.output_dir = output_dir or env.get("MCP_PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "mcp-profiles")
+        self.keep = int(env.get("MCP_PROFILE_KEEP", "50") if keep is None else keep)
+        self.enabled = bool(self.tools)
+
+    def status(self) -> str:
+        if not self.enabled:
+            return "Profiling: OFF"
+        return (f"Profiling: ON | Tools: {', '.join(sorted(self.tools))} | Mode: {self.mode} | "
+                f"Every: {self.every_n} | Slower than: {self.slow_ms}ms | Output: {self.output_dir}")
+
+    def should_sample(self, tool: str) -> bool:
+        if "*" not in self.tools and tool not in self.tools:
+            return False
+        self._calls[tool] += 1
+        # cProfile and the sampler watch the whole thread, so one sample at a time
+        return self._calls[tool] % self.every_n == 0 and not self._active
+
+    async def run(self, label: str, tool: str, fn, args, kwargs):
+        if not self.should_sample(tool):
+            return await fn(*args, **kwargs)
+
+        self._active = True
+        loop = asyncio.get_running_loop()
+        monitor = LoopMonitor()
+        monitor.start()
+        # Yield once so the tool's first step runs inside a monitored callback
+        await asyncio.sleep(0)
+
+        profile = sampler = None
+        if self.mode == "cprofile":
+            profile = cProfile.Profile()
+            profile.enable()
+        else:
+            sampler = StackSampler(threading.get_ident(), self.interval)
+            sampler.start()
+
+        start_wall, start_cpu = time.perf_counter(), time.thread_time()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            wall_ms = (time.perf_counter() - start_wall) * 1000
+            cpu_ms = (time.thread_time() - start_cpu) * 1000
+            if profile is not None:
+                profile.disable()
+            if sampler is not None:
+                sampler.stop()
+            timings = {
+                "tool": tool,
+                "server": label,
+                "mode": self.mode,
+                "started_at": time.time() - wall_ms / 1000,
+                "wall_ms": round(wall_ms, 3),
+                # thread CPU time includes any other task that ran meanwhile
+                "cpu_ms": round(cpu_ms, 3),
+                "wait_ms": round(max(0.0, wall_ms - cpu_ms), 3),
+                "asyncio_tasks": len(asyncio.all_tasks()),
+            }
+            # This step is still running; the monitor records it once it returns
+            loop.call_soon(self._finish, monitor, asyncio.current_task(), label, tool, profile, sampler, timings)
+
+    def _finish(self, monitor, task, label: str, tool: str, profile, sampler, timings: dict):
+        """Runs right after the tool call's last step: stops the monitor and writes the sample."""
+        monitor.stop()
+        self._active = False
+        if timings["wall_ms"] < self.slow_ms:
+            return
+        # time each task/callback spent running on the loop during the call
+        timings["loop_time"] = monitor.timings(task)
+        # File I/O (and rotation's directory scan) stays off the event loop
+        write = asyncio.create_task(asyncio.to_thread(self._write, label, tool, profile, sampler, timings))
+        self._writes.add(write)
+        write.add_done_callback(self._writes.discard)
+
+    def _write(self, label: str, tool: str, profile, sampler, timings: dict):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stem = os.path.join(self.output_dir, f"{label}-{tool}-{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}-{os.getpid()}")
+        if profile is not None:
+            profile.dump_stats(f"{stem}.prof")
+        if sampler is not None:
+            with open(f"{stem}.folded", "w", encoding="utf-8") as f:
+                for stack, count in sampler.counts.most_common():
+                    f.write(f"{stack} {count}\n")
+        with open(f"{stem}.json", "w", encoding="utf-8") as f:
+            json.dump(timings, f, indent=2)
+        self._rotate()
+
+    def _rotate(self):
+        """Deletes the oldest samples (every file sharing a stem) beyond `keep`."""
+        stems = {}
+        for entry in os.scandir(self.output_dir):
+            if entry.is_file() and entry.name.endswith((".prof", ".folded", ".json")):
+                stem = entry.name.rsplit(".", 1)[0]
+                stems.setdefault(stem, []).append(entry)
+        oldest_first = sorted(stems.values(), key=lambda files: min(f.stat().st_mtime for f in files))
+        for files in oldest_first[:max(0, len(oldest_first) - self.keep)]:
+            for f in files:
+                try:
+                    os.remove(f.path)
+                except OSError:
+                    pass
+
+
+profiler = Profiler()
+
+
+def profiled(fn):
+    """Wraps an async tool so it can be sampled by the profiler."""
+    module_file = getattr(sys.modules.get(fn.__module__), "__file__", None)
+    # Name samples after the server file, even when it runs as __main__
+    label = os.path.splitext(os.path.basename(module_file))[0] if module_file else fn.__module__
+    tool = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        if not profiler.enabled:
+            return await fn(*args, **kwargs)
+        return await profiler.run(label, tool, fn, args, kwargs)
+
+    return wrapper
+
+
+def add_admin_tool(mcp):
+    """Registers the configure_profiling tool on a FastMCP server."""
+
+    @mcp.tool()
+    async def configure_profiling(tools: str = None, every_n: int = None, slow_ms: float = None, mode: str = None) -> str:
+        """
+        Admin: turns tool-call profiling on or off.
+        tools: comma-separated tool names, "*" for all, "" to switch off.
+        every_n: sample every Nth call. slow_ms: only keep calls slower than this.
+        mode: "cprofile" or "stack". Omit everything to see the current status.
+        """
+        if all(v is None for v in (tools, every_n, slow_ms, mode)):
+            return profiler.status()
+        try:
+            profiler.configure(
+                tools=tools if tools is not None else ",".join(profiler.tools),
+                every_n=every_n if every_n is not None else profiler.every_n,
+                slow_ms=slow_ms if slow_ms is not None else profiler.slow_ms,
+                mode=mode or profiler.mode,
+                interval_ms=profiler.interval * 1000,
+                output_dir=profiler.output_dir,
+                keep=profiler.keep,
+            )
+        except ValueError as e:
+            return f"Error: {e}"
+        return profiler.status()
+
+    return configure_profiling
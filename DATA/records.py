@@ -0,0 +1,202 @@
+"""
+Compact record types for LinkedIn and HubSpot results.
+
+Upstream JSON is decoded (with orjson when it is installed) and immediately
+converted into slotted dataclasses, so only the fields the tools use stay in
+memory instead of whole `response.json()` dict trees.
+
+Large result sets go through a RecordSink, which enforces a per-call memory
+budget by truncating or spilling the overflow to a JSON-lines file on disk.
+"""
+from dataclasses import dataclass, astuple, fields, replace
+from typing import ClassVar
+import json
+import os
+import sys
+import tempfile
+
+try:
+    import orjson
+except ImportError:  # optional: pip install "linkedin-mcp[fast]"
+    orjson = None
+
+
+def decode_json(content: bytes):
+    """Decodes a response body, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+# --- LinkedIn ---
+
+@dataclass(slots=True, frozen=True)
+class AdAccount:
+    id: str
+    name: str | None = None
+    status: str | None = None
+
+    @classmethod
+    def from_element(cls, element: dict):
+        return cls(str(element.get("id")), element.get("name"), element.get("status"))
+
+
+@dataclass(slots=True, frozen=True)
+class Campaign:
+    id: str
+    name: str | None = None
+    status: str | None = None
+    account: str | None = None
+
+    @classmethod
+    def from_element(cls, element: dict):
+        return cls(str(element.get("id")), element.get("name"), element.get("status"), element.get("account"))
+
+
+@dataclass(slots=True, frozen=True)
+class AnalyticsRow:
+    pivot_values: tuple = ()
+    impressions: int = 0
+    clicks: int = 0
+    cost: float = 0.0
+
+    @classmethod
+    def from_element(cls, element: dict):
+        return cls(
+            tuple(element.get("pivotValues", ())),
+            int(element.get("impressions") or 0),
+            int(element.get("clicks") or 0),
+            float(element.get("costInLocalCurrency") or 0),
+        )
+
+
+# --- HubSpot ---
+
+class HubSpotRecord:
+    """Mixin for CRM objects: one slot per requested HubSpot property."""
+    __slots__ = ()
+    PROPERTIES: ClassVar[tuple] = ()
+
+    @classmethod
+    def from_result(cls, result: dict):
+        props = result.get("properties") or {}
+        return cls(str(result.get("id")), *(props.get(p) for p in cls.PROPERTIES))
+
+    def with_property(self, name: str, value):
+        """Returns a copy with one property changed (used for webhook deltas)."""
+        if name not in self.PROPERTIES:
+            return self
+        return replace(self, **{name: value})
+
+
+@dataclass(slots=True, frozen=True)
+class Contact(HubSpotRecord):
+    PROPERTIES: ClassVar[tuple] = ("firstname", "lastname", "email", "company", "jobtitle", "phone")
+    id: str
+    firstname: str | None = None
+    lastname: str | None = None
+    email: str | None = None
+    company: str | None = None
+    jobtitle: str | None = None
+    phone: str | None = None
+
+
+@dataclass(slots=True, frozen=True)
+class Company(HubSpotRecord):
+    PROPERTIES: ClassVar[tuple] = ("name", "domain", "city", "industry", "phone")
+    id: str
+    name: str | None = None
+    domain: str | None = None
+    city: str | None = None
+    industry: str | None = None
+    phone: str | None = None
+
+
+@dataclass(slots=True, frozen=True)
+class Deal(HubSpotRecord):
+    PROPERTIES: ClassVar[tuple] = ("dealname", "amount", "dealstage", "closedate", "pipeline")
+    id: str
+    dealname: str | None = None
+    amount: str | None = None
+    dealstage: str | None = None
+    closedate: str | None = None
+    pipeline: str | None = None
+
+
+# --- Memory budget ---
+
+def record_size(record) -> int:
+    """Approximate bytes held by a record and its field values."""
+    return sys.getsizeof(record) + sum(sys.getsizeof(getattr(record, f.name)) for f in fields(record))
+
+
+class RecordSink:
+    """
+    Collects records of one type within a memory budget.
+    Once `budget_bytes` is used up, further records are either dropped
+    (overflow="truncate") or appended to a temporary JSON-lines file
+    (overflow="spill") and read back lazily when the sink is iterated.
+    """
+
+    def __init__(self, record_type, budget_bytes: int = None, overflow: str = "truncate", spill_dir: str = None):
+        if overflow not in ("truncate", "spill"):
+            raise ValueError(f"Unknown overflow mode: {overflow}")
+        self.record_type = record_type
+        self.budget_bytes = budget_bytes
+        self.overflow = overflow
+        self.spill_dir = spill_dir
+        self.records = []
+        self.used_bytes = 0
+        self.truncated = False
+        self.spilled = 0
+        self._spill_file = None
+
+    @classmethod
+    def from_env(cls, record_type):
+        """Budget from MCP_MEMORY_BUDGET_MB (unset = unlimited), MCP_MEMORY_OVERFLOW and MCP_SPILL_DIR."""
+        budget_mb = os.environ.get("MCP_MEMORY_BUDGET_MB")
+        return cls(
+            record_type,
+            budget_bytes=int(float(budget_mb) * 1024 * 1024) if budget_mb else None,
+            overflow=os.environ.get("MCP_MEMORY_OVERFLOW", "truncate"),
+            spill_dir=os.environ.get("MCP_SPILL_DIR"),
+        )
+
+    def __len__(self):
+        return len(self.records) + self.spilled
+
+    def add(self, record) -> bool:
+        """Adds a record. Returns False once the sink is truncating, so callers can stop paging."""
+        if self.budget_bytes is None:
+            self.records.append(record)
+            return True
+        if self.truncated:
+            return False
+        size = record_size(record)
+        if self.used_bytes + size <= self.budget_bytes and not self.spilled:
+            self.records.append(record)
+            self.used_bytes += size
+            return True
+        if self.overflow == "truncate":
+            self.truncated = True
+            return False
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile("w+", encoding="utf-8", dir=self.spill_dir)
+        self._spill_file.write(json.dumps(astuple(record)) + "\n")
+        self.spilled += 1
+        return True
+
+    def __iter__(self):
+        yield from self.records
+        if self._spill_file is not None:
+            self._spill_file.flush()
+            self._spill_file.seek(0)
+            for line in self._spill_file:
+                values = json.loads(line)
+                yield self.record_type(*(tuple(v) if isinstance(v, list) else v for v in values))
+            self._spill_file.seek(0, os.SEEK_END)
+
+    def close(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
@@ -1,84 +1,198 @@
 from mcp.server.fastmcp import FastMCP
 import httpx
+import asyncio
 import datetime
 import json
+import os
+import sys
+from urllib.parse import quote
+
+from batching import MicroBatcher
+from cache import get_cache
+from records import AdAccount, Campaign, AnalyticsRow, decode_json
+from tokens import TokenManager, TokenError
+from profiling import add_admin_tool, profiled
 
 # 1. Initialize
 mcp = FastMCP("LinkedIn Ads")
+add_admin_tool(mcp)
 
 # 2. Config
-ACCESS_TOKEN = "AQWkKXim-oqXnFtJfr46yhTzjqGOpjUC4nDMIwE2udJaKxzwMD0ZVrQoEeYWAh_Sjuj4eVJoueJae2ktgtp1mADMfLu-5xoMOm8P1WbAd34QzIgu-xoNGahFylCpR2vIu3xLDz9jN6EUEH-N3YEjdRk7tbBeTp_Cw1BTVTfv98-97LlqF2Q_FaYnSnpUiQkIJa97QYt0NkG4QTalJociKJ7Vq2L8ZG7yuN3jlUqWqe0wxJf_zKmC1bte6tG4yOpLhRT0A2MjACrOyRTAZOyOvHWLmFa4_y1WW2O17nJ81b2506Xyz_IpSGthyfh2iDkst_wsLO017cnMOomldMfidhlenPspow"
 API_BASE = "https://api.linkedin.com/rest"
 
-def get_headers():
-    return {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
-        "LinkedIn-Version": "202511", 
-        "X-Restli-Protocol-Version": "2.0.0",
-        "Content-Type": "application/json"
-    }
+# LINKEDIN_ACCESS_TOKEN / LINKEDIN_REFRESH_TOKEN / LINKEDIN_TOKEN_FILE, refreshed before expiry or on a 401
+tokens = TokenManager.from_env("LINKEDIN")
+
+# Opt-in: caches for 900s by default when MCP_CACHE_DIR is set (shared across
+# server processes), otherwise only when LINKEDIN_CACHE_TTL is set
+cache = get_cache("linkedin", ttl_seconds=float(os.environ.get(
+    "LINKEDIN_CACHE_TTL", "900" if os.environ.get("MCP_CACHE_DIR") else "0"
+)))
+
+# Authorization is added per request by the token manager (AsyncClient(auth=tokens))
+HEADERS = {
+    "LinkedIn-Version": "202511", 
+    "X-Restli-Protocol-Version": "2.0.0",
+    "Content-Type": "application/json"
+}
 
 @mcp.tool()
+@profiled
 async def list_ad_accounts() -> str:
     """Lists all active LinkedIn Ad Accounts."""
     url = f"{API_BASE}/adAccounts"
     # Using simple search to avoid 400 errors
     params = {"q": "search"}
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=get_headers(), params=params)
-        except httpx.RequestError as e:
-            return f"Network Error: {str(e)}"
 
-    if response.status_code != 200:
-        return f"API Error ({response.status_code}): {response.text}"
+    records = cache.get("accounts:list")
+    if records is None:
+        async with httpx.AsyncClient(auth=tokens) as client:
+            try:
+                response = await client.get(url, headers=HEADERS, params=params)
+            except httpx.RequestError as e:
+                return f"Network Error: {str(e)}"
+            except TokenError as e:
+                return f"Auth Error: {str(e)}"
+
+        if response.status_code != 200:
+            return f"API Error ({response.status_code}): {response.text}"
+
+        records = [AdAccount.from_element(e) for e in decode_json(response.content).get("elements", [])]
+        cache.set("accounts:list", records)
 
-    data = response.json()
     accounts = []
-    
-    for element in data.get("elements", []):
-        name = element.get("name", "Unknown")
-        acc_id = element.get("id") 
-        acc_id_str = str(acc_id)
-        simple_id = acc_id_str.split(":")[-1] if acc_id_str else "N/A"
-        accounts.append(f"Account: {name} | ID: {acc_id} (Simple ID: {simple_id})")
+    for account in records:
+        name = account.name or "Unknown"
+        simple_id = account.id.split(":")[-1] if account.id else "N/A"
+        accounts.append(f"Account: {name} | ID: {account.id} (Simple ID: {simple_id})")
     
     return "\n".join(accounts) if accounts else "No active ad accounts found."
 
+class CampaignFetchError(Exception):
+    pass
+
+async def fetch_account_campaigns(client: httpx.AsyncClient, account_urn: str) -> list:
+    """Fetches one account's campaigns via /adAccounts/{id}/adCampaigns."""
+    simple_id = account_urn.split(":")[-1]
+    # NEW URL STRUCTURE (Fixes the 400 Error)
+    url = f"{API_BASE}/adAccounts/{simple_id}/adCampaigns"
+    response = await client.get(url, headers=HEADERS, params={"q": "search"})
+    if response.status_code != 200:
+        raise CampaignFetchError(f"Error fetching campaigns: {response.text}")
+    return [Campaign.from_element(c) for c in decode_json(response.content).get("elements", [])]
+
+def campaign_search_url(account_urns: list, page_token: str = None) -> str:
+    """
+    Builds the multi-account search URL by hand: Rest.li 2.0 wants the
+    List(...) syntax literal and only the URNs percent-encoded, which
+    generic query-string encoding would get wrong.
+    """
+    values = ",".join(quote(urn, safe="") for urn in account_urns)
+    url = f"{API_BASE}/adCampaigns?q=search&search=(account:(values:List({values})))&pageSize=1000"
+    if page_token:
+        url += f"&pageToken={quote(page_token, safe='')}"
+    return url
+
+# Set to False once the search is rejected (bad syntax / no permission), so
+# later batches go straight to per-account requests
+batch_search_supported = True
+SEARCH_REJECTED = (400, 403, 404)
+# Longest Retry-After we wait out before giving up on a rate-limited batch
+MAX_RETRY_AFTER = 5.0
+
+def retry_after(response: httpx.Response) -> float:
+    try:
+        return min(float(response.headers.get("Retry-After", "1")), MAX_RETRY_AFTER)
+    except ValueError:
+        return 1.0
+
+async def fetch_campaigns_batch(account_urns: list) -> dict:
+    """
+    Fetches campaigns for several accounts with one multi-account search
+    (/adCampaigns?q=search&search=(account:(values:List(...)))) and splits
+    the elements back out by account URN.
+    - 400/403/404: the search is rejected; falls back to per-account
+      requests, now and for every later batch.
+    - 429: waits out Retry-After once; if still rate limited, every account
+      gets the error instead of fanning out into more requests.
+    - Anything else (e.g. 5xx, or 401 after the token refresh): falls back
+      to per-account requests for this batch only.
+    """
+    global batch_search_supported
+    async with httpx.AsyncClient(auth=tokens) as client:
+        if len(account_urns) > 1 and batch_search_supported:
+            results = {urn: [] for urn in account_urns}
+            page_token = None
+            rate_limited = False
+            while True:
+                response = await client.get(campaign_search_url(account_urns, page_token), headers=HEADERS)
+                if response.status_code == 429:
+                    if rate_limited:
+                        error = CampaignFetchError(f"Rate limited by LinkedIn (429): {response.text}")
+                        return {urn: error for urn in account_urns}
+                    rate_limited = True
+                    await asyncio.sleep(retry_after(response))
+                    continue
+                if response.status_code != 200:
+                    if response.status_code in SEARCH_REJECTED:
+                        batch_search_supported = False
+                        print(f"LinkedIn multi-account campaign search rejected ({response.status_code}), "
+                              f"using per-account requests from now on: {response.text}", file=sys.stderr)
+                    break
+                data = decode_json(response.content)
+                for c in map(Campaign.from_element, data.get("elements", [])):
+                    if c.account in results:
+                        results[c.account].append(c)
+                page_token = data.get("metadata", {}).get("nextPageToken")
+                if not page_token:
+                    return results
+
+        fetched = await asyncio.gather(
+            *(fetch_account_campaigns(client, urn) for urn in account_urns),
+            return_exceptions=True
+        )
+        return dict(zip(account_urns, fetched))
+
+# Concurrent get_campaigns calls arriving within this window share one request
+campaign_batcher = MicroBatcher(
+    fetch_campaigns_batch,
+    window_seconds=float(os.environ.get("LINKEDIN_BATCH_WINDOW_MS", "5")) / 1000,
+    default=[]
+)
+
 @mcp.tool()
+@profiled
 async def get_campaigns(account_id: str) -> str:
     """
     Fetches all campaigns.
-    UPDATED: Uses the new mandated URL structure /adAccounts/{id}/adCampaigns
+    Concurrent calls for different accounts are micro-batched into one
+    multi-account search request.
     """
-    # Extract just the number for the URL
-    if "urn:li:sponsoredAccount:" in account_id:
-        simple_id = account_id.split(":")[-1]
-    else:
-        simple_id = account_id
+    # Normalize to the full URN so batched results can be matched back
+    simple_id = account_id.split(":")[-1]
+    account_urn = f"urn:li:sponsoredAccount:{simple_id}"
 
-    # NEW URL STRUCTURE (Fixes the 400 Error)
-    url = f"{API_BASE}/adAccounts/{simple_id}/adCampaigns"
-    params = {"q": "search"}
-
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=get_headers(), params=params)
-    
-    if response.status_code != 200:
-        return f"Error fetching campaigns: {response.text}"
+    cache_key = f"campaigns:{account_urn}"
+    elements = cache.get(cache_key)
+    if elements is None:
+        try:
+            elements = await campaign_batcher.load(account_urn)
+        except CampaignFetchError as e:
+            return str(e)
+        except httpx.RequestError as e:
+            return f"Network Error: {str(e)}"
+        except TokenError as e:
+            return f"Auth Error: {str(e)}"
+        cache.set(cache_key, elements)
 
-    data = response.json()
     campaigns = []
-    for c in data.get("elements", []):
-        c_id = c.get("id")
-        name = c.get("name")
-        status = c.get("status")
-        campaigns.append(f"[{status}] {name} (ID: {c_id})")
+    for c in elements:
+        campaigns.append(f"[{c.status}] {c.name} (ID: {c.id})")
 
     return "\n".join(campaigns) if campaigns else "No campaigns found."
 
 @mcp.tool()
+@profiled
 async def get_ad_analytics(account_id: str, days_back: int = 30) -> str:
     """
     Gets performance metrics.
@@ -93,8 +207,13 @@ async def get_ad_analytics(account_id: str, days_back: int = 30) -> str:
     end_date = today - datetime.timedelta(days=1)
     start_date = end_date - datetime.timedelta(days=days_back)
 
+    cache_key = f"analytics:{account_id}:{start_date}:{end_date}"
+    report = cache.get(cache_key)
+    if report is not None:
+        return report
+
     url = f"{API_BASE}/adAnalyticsV2"
-    
+
     params = {
         "q": "analytics",
         "pivot": "ACCOUNT",
@@ -109,25 +228,30 @@ async def get_ad_analytics(account_id: str, days_back: int = 30) -> str:
         "fields": "impressions,clicks,costInLocalCurrency"
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=get_headers(), params=params)
+    async with httpx.AsyncClient(auth=tokens) as client:
+        try:
+            response = await client.get(url, headers=HEADERS, params=params)
+        except TokenError as e:
+            return f"Auth Error: {str(e)}"
 
     # Correct handling of 404 (No Data)
     if response.status_code == 404:
-        return "Report: Connected successfully. No ad spend found for these dates (LinkedIn returns 404 for 0 activity)."
-
-    if response.status_code != 200:
+        report = "Report: Connected successfully. No ad spend found for these dates (LinkedIn returns 404 for 0 activity)."
+    elif response.status_code != 200:
         return f"API Error ({response.status_code}): {response.text}"
+    else:
+        data = decode_json(response.content)
+        if not data.get("elements"):
+            report = "Request OK, but 0 rows returned."
+        else:
+            row = AnalyticsRow.from_element(data["elements"][0])
+            report = (f"--- REPORT ---\n"
+                      f"Spend: {row.cost}\n"
+                      f"Impressions: {row.impressions}\n"
+                      f"Clicks: {row.clicks}")
 
-    data = response.json()
-    if not data.get("elements"):
-        return "Request OK, but 0 rows returned."
-
-    row = data["elements"][0]
-    return (f"--- REPORT ---\n"
-            f"Spend: {row.get('costInLocalCurrency', 0)}\n"
-            f"Impressions: {row.get('impressions', 0)}\n"
-            f"Clicks: {row.get('clicks', 0)}")
+    cache.set(cache_key, report)
+    return report
 
 if __name__ == "__main__":
     mcp.run()
\ No newline at end of file
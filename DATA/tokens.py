@@ -0,0 +1,197 @@
+"""
+OAuth access token lifecycle.
+
+Credentials come from a JSON token file and/or environment variables named
+after a prefix (e.g. LINKEDIN_ACCESS_TOKEN, LINKEDIN_REFRESH_TOKEN). The token
+is refreshed with the refresh token shortly before it expires, so tool calls
+rarely spend a round trip on a 401. Refreshes happen under a lock: concurrent
+callers wait for the one refresh in flight instead of each hitting the token
+endpoint.
+
+TokenManager is an httpx auth (AsyncClient(auth=tokens)). If the API still
+answers 401 (expiry unknown, token revoked early), the token is refreshed
+under the same lock and the request is retried once.
+
+Token file format (written back after every refresh):
+    {"access_token": "...", "refresh_token": "...", "expires_at": 1767225600}
+"""
+import asyncio
+import json
+import os
+import time
+
+import httpx
+
+TOKEN_URLS = {
+    "LINKEDIN": "https://www.linkedin.com/oauth/v2/accessToken",
+    "HUBSPOT": "https://api.hubapi.com/oauth/v1/token",
+}
+
+
+class TokenError(Exception):
+    pass
+
+
+def load_credentials(prefix: str) -> dict:
+    """
+    Reads credentials for `prefix` from {prefix}_TOKEN_FILE (if it exists) and
+    the environment. The file wins for token fields, since it holds the most
+    recently refreshed values.
+    """
+    env = os.environ
+    credentials = {
+        "access_token": env.get(f"{prefix}_ACCESS_TOKEN"),
+        "refresh_token": env.get(f"{prefix}_REFRESH_TOKEN"),
+        "expires_at": float(env[f"{prefix}_TOKEN_EXPIRES_AT"]) if env.get(f"{prefix}_TOKEN_EXPIRES_AT") else None,
+        "client_id": env.get(f"{prefix}_CLIENT_ID"),
+        "client_secret": env.get(f"{prefix}_CLIENT_SECRET"),
+        "token_url": env.get(f"{prefix}_TOKEN_URL", TOKEN_URLS.get(prefix)),
+        "token_file": env.get(f"{prefix}_TOKEN_FILE"),
+    }
+    token_file = credentials["token_file"]
+    if token_file and os.path.exists(token_file):
+        with open(token_file, encoding="utf-8") as f:
+            stored = json.load(f)
+        for field in ("access_token", "refresh_token", "expires_at"):
+            if stored.get(field):
+                credentials[field] = stored[field]
+    return credentials
+
+
+def load_access_token(prefix: str) -> str:
+    """Current access token for scripts that don't need refreshing."""
+    token = load_credentials(prefix)["access_token"]
+    if not token:
+        raise ValueError(f"{prefix}_ACCESS_TOKEN environment variable (or {prefix}_TOKEN_FILE) is not set")
+    return token
+
+
+class TokenManager(httpx.Auth):
+    """Hands out a valid access token, refreshing it `refresh_margin` seconds before expiry."""
+
+    def __init__(self, access_token: str = None, refresh_token: str = None, expires_at: float = None,
+                 client_id: str = None, client_secret: str = None, token_url: str = None,
+                 token_file: str = None, refresh_margin: float = 300.0, name: str = "OAuth"):
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_url = token_url
+        self.token_file = token_file
+        self.refresh_margin = refresh_margin
+        self.name = name
+        self.refresh_count = 0
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_env(cls, prefix: str, **kwargs):
+        credentials = load_credentials(prefix)
+        if not credentials["access_token"] and not credentials["refresh_token"]:
+            raise ValueError(f"{prefix}_ACCESS_TOKEN environment variable (or {prefix}_TOKEN_FILE) is not set")
+        return cls(**credentials, name=prefix, **kwargs)
+
+    @property
+    def can_refresh(self) -> bool:
+        return bool(self.refresh_token and self.token_url)
+
+    def needs_refresh(self) -> bool:
+        if not self.access_token:
+            return True
+        if self.expires_at is None:
+            # Unknown expiry: use the token until the API rejects it (see async_auth_flow)
+            return False
+        return time.time() >= self.expires_at - self.refresh_margin
+
+    async def get_token(self) -> str:
+        if not self.needs_refresh():
+            return self.access_token
+        if not self.can_refresh:
+            # Nothing to refresh with; let the API report the expired token
+            if self.access_token:
+                return self.access_token
+            raise TokenError(f"{self.name}: no access token and no refresh token configured")
+
+        async with self._lock:
+            # Another caller may have refreshed while we waited
+            if self.needs_refresh():
+                self._reload_file()
+            if self.needs_refresh():
+                await self.refresh()
+        return self.access_token
+
+    async def refresh_rejected(self, token: str) -> str:
+        """Refreshes after the API rejected `token` with a 401, unless another caller already has."""
+        async with self._lock:
+            if self.access_token == token:
+                self._reload_file()
+            if self.access_token == token:
+                await self.refresh()
+        return self.access_token
+
+    async def async_auth_flow(self, request):
+        token = await self.get_token()
+        request.headers["Authorization"] = f"Bearer {token}"
+        response = yield request
+        if response.status_code == 401 and self.can_refresh:
+            request.headers["Authorization"] = f"Bearer {await self.refresh_rejected(token)}"
+            yield request
+
+    def sync_auth_flow(self, request):
+        raise RuntimeError(f"{self.name}: TokenManager only works with httpx.AsyncClient")
+
+    async def refresh(self):
+        data = {
+            "grant_type": "refresh_token",
+            "refresh_token": self.refresh_token,
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+        }
+        async with httpx.AsyncClient() as client:
+            try:
+                response = await client.post(self.token_url, data={k: v for k, v in data.items() if v})
+            except httpx.RequestError as e:
+                raise TokenError(f"{self.name}: token refresh failed: {e}") from e
+
+        if response.status_code != 200:
+            raise TokenError(f"{self.name}: token refresh failed ({response.status_code}): {response.text}")
+
+        payload = response.json()
+        if not payload.get("access_token"):
+            raise TokenError(f"{self.name}: token endpoint returned no access_token")
+        self.access_token = payload["access_token"]
+        # Some providers rotate the refresh token on every refresh
+        self.refresh_token = payload.get("refresh_token", self.refresh_token)
+        expires_in = payload.get("expires_in")
+        self.expires_at = time.time() + float(expires_in) if expires_in else None
+        self.refresh_count += 1
+        self._save_file()
+
+    def _reload_file(self):
+        """Picks up a token another server process already refreshed."""
+        if not self.token_file or not os.path.exists(self.token_file):
+            return
+        try:
+            with open(self.token_file, encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        if stored.get("access_token") and (stored.get("expires_at") or 0) > (self.expires_at or 0):
+            self.access_token = stored["access_token"]
+            self.refresh_token = stored.get("refresh_token", self.refresh_token)
+            self.expires_at = stored["expires_at"]
+
+    def _save_file(self):
+        if not self.token_file:
+            return
+        tmp_path = f"{self.token_file}.tmp"
+        # Owner-only, since it holds the refresh token (chmod too, in case a stale tmp file was looser)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.chmod(tmp_path, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({
+                "access_token": self.access_token,
+                "refresh_token": self.refresh_token,
+                "expires_at": self.expires_at,
+            }, f)
+        os.replace(tmp_path, self.token_file)
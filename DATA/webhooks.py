@@ -0,0 +1,226 @@
+"""
+HubSpot webhook receiver.
+
+Consumes HubSpot event batches (contact/company/deal creation, propertyChange
+and deletion) and applies them to the result cache in hubspot_server.py:
+
+- creation:       drops cached lists of that object type (the new object may belong in them)
+- propertyChange: patches the property on cached lists that contain the object
+                  and drops every cached search of that type (unsigned events
+                  only drop entries: their values are never served)
+- deletion:       drops only the cached entries that contain the object
+
+Cache entries are keyed "<type>:<kind>:<args>" and tagged with the object type
+and "<type>:<id>" for every record they hold, so we never refetch whole lists.
+"""
+import base64
+import contextlib
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import re
+import socket
+import sys
+import time
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+OBJECT_TYPES = ("contact", "company", "deal")
+# HubSpot rejects v3 signatures older than 5 minutes; so do we
+MAX_SIGNATURE_AGE_MS = 5 * 60 * 1000
+# HubSpot decodes exactly these escapes in the request URI before signing
+SIGNATURE_DECODED = {
+    "%3A": ":", "%2F": "/", "%3F": "?", "%40": "@", "%21": "!", "%24": "$",
+    "%27": "'", "%28": "(", "%29": ")", "%2A": "*", "%2C": ",", "%3B": ";",
+}
+
+
+def record_tags(object_type: str, records, search: bool = False) -> set:
+    """Tags for a cached list of HubSpot records. Search results also get "<type>:search"."""
+    tags = {object_type} | {f"{object_type}:{r.id}" for r in records}
+    if search:
+        tags.add(f"{object_type}:search")
+    return tags
+
+
+def apply_event(cache, event: dict, trusted: bool = True) -> str:
+    """
+    Applies one HubSpot webhook event to the cache. Returns what was done.
+    Untrusted (unsigned) events may only drop entries, never write values.
+    """
+    subscription = event.get("subscriptionType", "")
+    object_type, _, action = subscription.partition(".")
+    object_id = str(event.get("objectId"))
+    if object_type not in OBJECT_TYPES:
+        return "ignored"
+
+    if action == "creation":
+        cache.invalidate_tag(object_type)
+        return "invalidated"
+
+    if action == "propertyChange" and trusted:
+        name = event.get("propertyName")
+        value = event.get("propertyValue")
+        # Any search can gain or lose this object when a property changes,
+        # including searches it is not in yet, so drop them all
+        cache.invalidate_tag(f"{object_type}:search")
+
+        def patch(records):
+            return [r.with_property(name, value) if r.id == object_id else r for r in records]
+
+        # Read-modify-write in one step, so a fresh list another process just
+        # stored in a shared cache is patched rather than overwritten
+        for key in cache.keys_for_tag(f"{object_type}:{object_id}"):
+            if not cache.modify(key, patch):
+                cache.invalidate(key)
+        return "patched"
+
+    # deletion, merge, restore, associationChange, unsigned propertyChange...:
+    # drop whatever holds the object
+    if action == "propertyChange":
+        cache.invalidate_tag(f"{object_type}:search")
+    cache.invalidate_tag(f"{object_type}:{object_id}")
+    return "invalidated"
+
+
+def apply_events(cache, events: list, trusted: bool = True) -> dict:
+    """Applies a batch in occurrence order (HubSpot does not guarantee ordering)."""
+    counts = {}
+    for event in sorted(events, key=lambda e: e.get("occurredAt", 0)):
+        outcome = apply_event(cache, event, trusted)
+        counts[outcome] = counts.get(outcome, 0) + 1
+    return counts
+
+
+def signature_uri(uri: str) -> str:
+    """Applies HubSpot's v3 URI-decoding rules to the request URI."""
+    return re.sub(r"%[0-9A-Fa-f]{2}", lambda m: SIGNATURE_DECODED.get(m.group(0).upper(), m.group(0)), uri)
+
+
+def public_uri(request: Request, public_url: str = None) -> str:
+    """
+    The URI HubSpot signed. Behind a tunnel or reverse proxy the receiver only
+    sees its internal URL, so HUBSPOT_WEBHOOK_URL (the URL configured in the
+    HubSpot app) takes precedence; the query string is appended to it.
+    """
+    if not public_url:
+        return str(request.url)
+    query = request.url.query
+    return f"{public_url}?{query}" if query else public_url
+
+
+def verify_signature(secret: str, method: str, uri: str, body: bytes, headers) -> bool:
+    """Checks HubSpot's X-HubSpot-Signature-v3 header."""
+    signature = headers.get("x-hubspot-signature-v3")
+    timestamp = headers.get("x-hubspot-request-timestamp")
+    if not signature or not timestamp:
+        return False
+    try:
+        if time.time() * 1000 - int(timestamp) > MAX_SIGNATURE_AGE_MS:
+            return False
+    except ValueError:
+        return False
+    source = f"{method}{signature_uri(uri)}{body.decode('utf-8')}{timestamp}".encode("utf-8")
+    expected = base64.b64encode(hmac.new(secret.encode("utf-8"), source, hashlib.sha256).digest()).decode()
+    return hmac.compare_digest(expected, signature)
+
+
+def create_app(cache, client_secret: str = None, path: str = "/webhooks/hubspot", public_url: str = None) -> Starlette:
+    """
+    Builds the ASGI app. Signatures are only checked when a client secret is
+    given, against `public_url` when set (see public_uri). Without a secret
+    events are unauthenticated, so they can only invalidate cache entries.
+    """
+
+    async def receive(request: Request) -> Response:
+        body = await request.body()
+        uri = public_uri(request, public_url)
+        if client_secret and not verify_signature(client_secret, request.method, uri, body, request.headers):
+            return JSONResponse({"error": "invalid signature"}, status_code=401)
+        try:
+            events = json.loads(body or b"[]")
+        except ValueError:
+            return JSONResponse({"error": "invalid JSON"}, status_code=400)
+        if isinstance(events, dict):
+            events = [events]
+        return JSONResponse({"received": len(events), "applied": apply_events(cache, events, trusted=bool(client_secret))})
+
+    return Starlette(routes=[Route(path, receive, methods=["POST"])])
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """
+    Binds the receiver's listening socket up front, so a port that is already
+    taken (e.g. by another client's server process) raises OSError here
+    instead of uvicorn calling sys.exit() inside the event loop.
+    """
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        if os.name != "nt":
+            # On Windows SO_REUSEADDR would let us steal a port that is in use
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(128)
+    except OSError:
+        sock.close()
+        raise
+    sock.set_inheritable(True)
+    return sock
+
+
+async def serve(server, sock: socket.socket):
+    """Runs the receiver on a bound socket; a startup failure never exits the MCP process."""
+    try:
+        await server.serve(sockets=[sock])
+    except SystemExit as e:
+        print(f"HubSpot webhook receiver stopped (exit code {e.code})", file=sys.stderr)
+    finally:
+        sock.close()
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def create_server(cache, host: str = "127.0.0.1", port: int = 8765):
+    """
+    Builds a uvicorn server for the receiver. Run it with
+    `await serve(server, bind_socket(host, port))` and stop it with
+    `server.should_exit = True`.
+    Access logs are off: stdout belongs to the MCP stdio transport.
+    Raises ValueError for a non-loopback host without HUBSPOT_CLIENT_SECRET,
+    since anyone who can reach it could then post events.
+    """
+    import uvicorn
+
+    client_secret = os.environ.get("HUBSPOT_CLIENT_SECRET")
+    if not client_secret and not is_loopback(host):
+        raise ValueError(f"refusing to listen on {host} without HUBSPOT_CLIENT_SECRET (signature checks)")
+
+    class EmbeddedServer(uvicorn.Server):
+        # The MCP server owns the process signals
+        def install_signal_handlers(self):
+            pass
+
+        @contextlib.contextmanager
+        def capture_signals(self):
+            yield
+
+    app = create_app(
+        cache,
+        client_secret=client_secret,
+        public_url=os.environ.get("HUBSPOT_WEBHOOK_URL")
+    )
+    config = uvicorn.Config(app, host=host, port=port, access_log=False, log_level="warning", lifespan="off")
+    return EmbeddedServer(config)